@@ -1,6 +1,5 @@
 from bs4 import BeautifulSoup
 from enum import IntEnum
-from urllib.parse import urlparse
 from time import time
 import aiohttp
 import asyncio
@@ -15,6 +14,12 @@ REGEX_MOBAFIRE   = r'^((http|https):\/\/)?(www\.)?mobafire\.com\/league-of-legen
 ROLES_MOBALYTICS = ('top', 'jungle', 'mid', 'adc', 'support')
 ROLES_OPGG       = ('top', 'jungle', 'mid', 'bot', 'support')
 
+# Base URLs of the remote servers (overridable, e.g. to target a local stub)
+DDRAGON_URL    = 'https://ddragon.leagueoflegends.com'
+MOBAFIRE_URL   = 'https://www.mobafire.com'
+MOBALYTICS_URL = 'https://api.mobalytics.gg'
+OPGG_URL       = 'https://www.op.gg'
+
 REQUEST_TIMEOUT    = 10    # in seconds
 DATA_REFRESH_DELAY = 86400 # in seconds
 
@@ -47,7 +52,7 @@ async def fetch_game_data():
 	if time() - cache['time'] >= DATA_REFRESH_DELAY or not cache['version']:
 		async with aiohttp.ClientSession() as sess:
 			try:
-				async with sess.get('https://ddragon.leagueoflegends.com/api/versions.json', timeout=REQUEST_TIMEOUT) as resp:
+				async with sess.get(DDRAGON_URL + '/api/versions.json', timeout=REQUEST_TIMEOUT) as resp:
 					if resp.status != 200:
 						raise RuntimeError("Could not retrieve latest game version number from League of Legends CDN")
 
@@ -74,7 +79,7 @@ async def fetch_game_data():
 async def fetch_items(version):
 	async with aiohttp.ClientSession() as sess:
 		try:
-			async with sess.get('https://ddragon.leagueoflegends.com/cdn/' + version + '/data/en_US/item.json', timeout=REQUEST_TIMEOUT) as resp:
+			async with sess.get(DDRAGON_URL + '/cdn/' + version + '/data/en_US/item.json', timeout=REQUEST_TIMEOUT) as resp:
 				if resp.status != 200:
 					raise RuntimeError("Could not retrieve items data from League of Legends CDN")
 
@@ -91,7 +96,7 @@ async def fetch_items(version):
 async def fetch_champions(version):
 	async with aiohttp.ClientSession() as sess:
 		try:
-			async with sess.get('https://ddragon.leagueoflegends.com/cdn/' + version + '/data/en_US/champion.json', timeout=REQUEST_TIMEOUT) as resp:
+			async with sess.get(DDRAGON_URL + '/cdn/' + version + '/data/en_US/champion.json', timeout=REQUEST_TIMEOUT) as resp:
 				if resp.status != 200:
 					raise RuntimeError("Could not retrieve champions data from League of Legends CDN")
 
@@ -176,11 +181,11 @@ async def translate_mobafire(set_name=None, url=None, build_index=0):
 		except ValueError:
 			return {'code': ReturnCode.ERR_INVALID_PARAM, 'error': "build_index must be an int"}
 
-	url = urlparse(url, 'https')
+	path = url[url.index('/league-of-legends/'):]
 
 	async with aiohttp.ClientSession() as sess:
 		try:
-			async with sess.get(url.scheme + '://' + url.netloc + url.path, timeout=REQUEST_TIMEOUT) as resp:
+			async with sess.get(MOBAFIRE_URL + path, timeout=REQUEST_TIMEOUT) as resp:
 				if resp.status != 200:
 					return {'code': ReturnCode.ERR_REMOTE_FAIL, 'error': "Unexpected response from the given MOBAfire guide's webpage. Server returned status code " + str(resp.status)}
 
@@ -366,16 +371,16 @@ async def translate_mobalytics(champion_key=None, champion_name=None, role=None)
 	
 	async with aiohttp.ClientSession() as sess:
 		try:
-			async with sess.get('https://api.mobalytics.gg/lol/champions/v1/meta', params={'name': champion_name}, timeout=REQUEST_TIMEOUT) as resp:
+			async with sess.get(MOBALYTICS_URL + '/lol/champions/v1/meta', params={'name': champion_name}, timeout=REQUEST_TIMEOUT) as resp:
 				# Mime type of response is 'text/plain' so we cannot use `resp.json` (or an error is thrown)
-				text = await resp.text()
-				data = json.loads(text)
-
 				if resp.status != 200:
 					if resp.status == 404:
 						return {'code': ReturnCode.ERR_REMOTE_FAIL, 'error': "Could not reach the given Mobalytics build's data. Server returned status code 404 (there may be no Mobalytics builds for this champion yet)"}
 
-					return {'code': ReturnCode.ERR_REMOTE_FAIL, 'error': "Could not reach the given Mobalytics build's data. Server returned status code " + str(resp.status_code)}
+					return {'code': ReturnCode.ERR_REMOTE_FAIL, 'error': "Could not reach the given Mobalytics build's data. Server returned status code " + str(resp.status)}
+
+				text = await resp.text()
+				data = json.loads(text)
 
 				item_sets = []
 
@@ -495,7 +500,7 @@ async def translate_opgg(set_name=None, champion_key=None, champion_name=None, r
 			except RuntimeError:
 				return {'code': ReturnCode.ERR_REMOTE_FAIL, 'error': "Could not retrieve champions data from the League of Legends CDN"}
 
-		url = "https://www.op.gg/champion/{}/statistics/{}".format(champion_name, role)
+		url = OPGG_URL + "/champion/{}/statistics/{}".format(champion_name, role)
 
 		async with aiohttp.ClientSession() as sess:
 			try:
@@ -0,0 +1,401 @@
+"""
+	Soak test: drives `translate` for every implemented translator at a fixed
+	(open-loop) request rate against a local stub of the remote servers, while
+	the stub randomly injects slow responses, 5xx errors and Data Dragon version
+	rollovers. Exits with a non-zero status if any threshold is exceeded.
+
+	Usage: python soak.py --rate 20 --duration 300 --slo-p99 1000
+"""
+
+from aiohttp import web
+from time import monotonic
+import argparse
+import asyncio
+import collections
+import gc
+import itemsetcopier
+import json
+import os
+import random
+import resource
+import sys
+
+
+TRANSLATORS = (itemsetcopier.Translator.MOBAFIRE, itemsetcopier.Translator.MOBALYTICS, itemsetcopier.Translator.OPGG) # CHAMPIONGG is not implemented yet
+
+ITEMS = {
+	'1055': "Doran's Blade",
+	'2003': "Health Potion",
+	'3047': "Plated Steelcaps",
+	'3078': "Trinity Force",
+	'3340': "Warding Totem (Trinket)",
+}
+
+CHAMPIONS = {
+	'Ahri': '103',
+	'Graves': '104',
+	'Jax': '24',
+}
+
+
+class Histogram:
+	"""
+		Log-linear latency histogram in the spirit of HdrHistogram: values are
+		recorded in integer units (microseconds here) with a relative precision
+		of 1/SUB_BUCKET_HALF_COUNT (~1.5%), using constant memory per magnitude.
+	"""
+
+	SUB_BUCKET_HALF_COUNT = 64
+
+	def __init__(self):
+		self.counts = collections.Counter()
+		self.total = 0
+		self.max = 0
+
+	def _index(self, value):
+		bucket = max(0, value.bit_length() - self.SUB_BUCKET_HALF_COUNT.bit_length())
+		return bucket * self.SUB_BUCKET_HALF_COUNT + (value >> bucket)
+
+	def _highest_equivalent_value(self, index):
+		if index < 2 * self.SUB_BUCKET_HALF_COUNT:
+			return index
+
+		bucket = (index - self.SUB_BUCKET_HALF_COUNT) // self.SUB_BUCKET_HALF_COUNT
+		sub_bucket = index - bucket * self.SUB_BUCKET_HALF_COUNT
+		return ((sub_bucket + 1) << bucket) - 1
+
+	def record(self, value):
+		value = max(0, int(value))
+		self.counts[self._index(value)] += 1
+		self.total += 1
+		self.max = max(self.max, value)
+
+	def percentile(self, percent):
+		if not self.total:
+			return 0
+
+		threshold = max(1, round(self.total * percent / 100))
+		seen = 0
+
+		for index in sorted(self.counts):
+			seen += self.counts[index]
+
+			if seen >= threshold:
+				return min(self._highest_equivalent_value(index), self.max)
+
+		return self.max
+
+
+class StubUpstream:
+	"""
+		Local stand-in for Data Dragon, MOBAfire, Mobalytics and OP.GG.
+	"""
+
+	def __init__(self, rng, slow_rate, slow_delay, error_rate):
+		self.rng = rng
+		self.slow_rate = slow_rate
+		self.slow_delay = slow_delay
+		self.error_rate = error_rate
+		self.patch = 1
+		self.injected = collections.Counter()
+
+		self.app = web.Application(middlewares=[self.inject_faults])
+		self.app.router.add_get('/api/versions.json', self.versions)
+		self.app.router.add_get('/cdn/{version}/data/en_US/item.json', self.items)
+		self.app.router.add_get('/cdn/{version}/data/en_US/champion.json', self.champions)
+		self.app.router.add_get('/league-of-legends/build/{guide}', self.mobafire)
+		self.app.router.add_get('/lol/champions/v1/meta', self.mobalytics)
+		self.app.router.add_get('/champion/{champion}/statistics/{role}', self.opgg)
+
+	def rollover(self):
+		self.patch += 1
+		self.injected['rollover'] += 1
+
+	@web.middleware
+	async def inject_faults(self, request, handler):
+		if self.rng.random() < self.slow_rate:
+			self.injected['slow'] += 1
+			await asyncio.sleep(self.slow_delay)
+
+		if self.rng.random() < self.error_rate:
+			self.injected['5xx'] += 1
+			return web.Response(status=self.rng.choice((500, 502, 503, 504)), text="Injected failure")
+
+		return await handler(request)
+
+	async def versions(self, request):
+		return web.json_response(['10.{}.1'.format(patch) for patch in range(self.patch, 0, -1)])
+
+	async def items(self, request):
+		return web.json_response({'data': {id_: {'name': name} for id_, name in ITEMS.items()}})
+
+	async def champions(self, request):
+		return web.json_response({'data': {name: {'id': name, 'key': key, 'name': name} for name, key in CHAMPIONS.items()}})
+
+	async def mobafire(self, request):
+		items = ''.join(
+			"<span class=\"ajax-tooltip {{t:'Item',i:'{}'}}\"><a><span>{}</span><label>1</label></a></span>".format(id_, name.replace(" (Trinket)", ""))
+			for id_, name in ITEMS.items()
+		)
+		build = (
+			"<div class=\"view-guide__build\"><div class=\"view-guide__build__items\"><div class=\"collapseBox\">"
+			"<div class=\"view-guide__items\"><div class=\"view-guide__items__bar\"><span>Full build</span></div>"
+			"<div class=\"view-guide__items__content\">" + items + "</div></div>"
+			"</div></div></div>"
+		)
+		html = "<html><head><title>Jax Build Guide : Stub</title></head><body>" + build * 2 + "</body></html>"
+		return web.Response(text=html, content_type='text/html')
+
+	async def mobalytics(self, request):
+		build = {
+			'name': request.query.get('name', '') + " build",
+			'items': {
+				'general': {'start': ['1055', '2003', '2003'], 'core': ['3078', '3047']},
+				'situational': [{'name': "Defensive", 'build': ['3047']}],
+			},
+		}
+		data = {'data': {'roles': [{'name': role, 'builds': [build]} for role in itemsetcopier.ROLES_MOBALYTICS]}}
+
+		# Mobalytics serves its JSON as 'text/plain'
+		return web.Response(text=json.dumps(data))
+
+	async def opgg(self, request):
+		items = ''.join(
+			"<li class=\"champion-stats__list__item tip\"><img src=\"//stub/item/{}.png\"></li>".format(id_)
+			for id_ in ITEMS
+		)
+		row = (
+			"<tr class=\"champion-overview__row champion-overview__row--first\"><th>Core Build</th>"
+			"<td class=\"champion-overview__data\"><ul>" + items + "</ul></td>"
+			"<td class=\"champion-overview__stats champion-overview__stats--pick\"><strong>42.00%</strong></td></tr>"
+		)
+		table = "<table class=\"champion-overview__table\"><tbody>" + row * 3 + "</tbody></table>"
+		return web.Response(text="<html><body>" + table * 2 + "</body></html>", content_type='text/html')
+
+
+def request_params(translator):
+	if translator == itemsetcopier.Translator.MOBAFIRE:
+		return {'set_name': "Jax Top", 'url': 'https://www.mobafire.com/league-of-legends/build/stub-jax-guide-503356', 'build_index': 1}
+
+	if translator == itemsetcopier.Translator.MOBALYTICS:
+		return {'champion_name': 'Ahri', 'role': 'mid'}
+
+	if translator == itemsetcopier.Translator.OPGG:
+		return {'set_name': "Graves Jgl", 'champion_key': 104, 'role': 'jungle'}
+
+	raise RuntimeError("Unknown translator")
+
+
+def open_fds():
+	try:
+		return len(os.listdir('/proc/self/fd'))
+	except OSError:
+		return -1
+
+
+def rss_bytes():
+	try:
+		with open('/proc/self/statm') as statm:
+			return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+	except OSError:
+		# Falls back to the peak RSS (KiB on Linux, bytes on macOS)
+		return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+class SoakTest:
+	def __init__(self, args):
+		self.args = args
+		self.rng = random.Random(args.seed)
+		self.stub = StubUpstream(self.rng, args.slow_rate, args.slow_delay, args.error_rate)
+		self.latencies = {translator: Histogram() for translator in TRANSLATORS}
+		self.loop_lag = Histogram()
+		self.outcomes = collections.Counter()
+		self.in_flight = set()
+		self.max_in_flight = 0
+		self.samples = []
+		self.running = True
+
+	async def _translate(self, translator, scheduled):
+		try:
+			res = await itemsetcopier.translate(translator, **request_params(translator))
+			self.outcomes[res['code'].name] += 1
+		except Exception as e:
+			self.outcomes['exception: ' + type(e).__name__] += 1
+		finally:
+			# Measured from the scheduled send time to avoid coordinated omission
+			self.latencies[translator].record((monotonic() - scheduled) * 1e6)
+
+	async def _generate_load(self, start):
+		interval = 1 / self.args.rate
+		sent = 0
+
+		while True:
+			scheduled = start + sent * interval
+
+			if scheduled - start >= self.args.duration:
+				break
+
+			delay = scheduled - monotonic()
+
+			if delay > 0:
+				await asyncio.sleep(delay)
+
+			task = asyncio.ensure_future(self._translate(TRANSLATORS[sent % len(TRANSLATORS)], scheduled))
+			self.in_flight.add(task)
+			task.add_done_callback(self.in_flight.discard)
+			self.max_in_flight = max(self.max_in_flight, len(self.in_flight))
+			sent += 1
+
+	async def _monitor_loop_lag(self):
+		interval = 0.05
+
+		while self.running:
+			before = monotonic()
+			await asyncio.sleep(interval)
+			self.loop_lag.record((monotonic() - before - interval) * 1e6)
+
+	async def _rollover_versions(self):
+		while self.running:
+			await asyncio.sleep(self.rng.expovariate(1 / self.args.rollover_interval))
+			self.stub.rollover()
+
+	async def _sample(self, start):
+		while self.running:
+			await asyncio.sleep(self.args.sample_interval)
+			sample = (monotonic() - start, rss_bytes(), open_fds(), len(asyncio.all_tasks()))
+			self.samples.append(sample)
+			print("[{:7.1f}s] rss={:.1f}MB fds={} tasks={} in_flight={} version={}".format(
+				sample[0], sample[1] / 2**20, sample[2], sample[3], len(self.in_flight), itemsetcopier.cache['version']))
+
+	async def run(self):
+		runner = web.AppRunner(self.stub.app)
+		await runner.setup()
+		site = web.TCPSite(runner, '127.0.0.1', 0)
+		await site.start()
+		port = runner.addresses[0][1]
+
+		stub_url = 'http://127.0.0.1:{}'.format(port)
+		itemsetcopier.DDRAGON_URL = stub_url
+		itemsetcopier.MOBAFIRE_URL = stub_url
+		itemsetcopier.MOBALYTICS_URL = stub_url
+		itemsetcopier.OPGG_URL = stub_url
+		itemsetcopier.DATA_REFRESH_DELAY = self.args.refresh_delay
+
+		gc.collect()
+		self.baseline = (rss_bytes(), open_fds())
+
+		start = monotonic()
+		background = [
+			asyncio.ensure_future(self._monitor_loop_lag()),
+			asyncio.ensure_future(self._rollover_versions()),
+			asyncio.ensure_future(self._sample(start)),
+		]
+
+		await self._generate_load(start)
+
+		if self.in_flight:
+			await asyncio.wait(set(self.in_flight))
+
+		self.running = False
+
+		for task in background:
+			task.cancel()
+
+		await asyncio.gather(*background, return_exceptions=True)
+
+		# Give the transports closed by the last requests a chance to release their sockets
+		await asyncio.sleep(0.25)
+		gc.collect()
+		self.final = (rss_bytes(), open_fds())
+
+		await runner.cleanup()
+
+	def report(self):
+		args = self.args
+		failures = []
+
+		print()
+		print("{:<12} {:>8} {:>10} {:>10} {:>10} {:>10} {:>10}".format("translator", "count", "p50 ms", "p90 ms", "p99 ms", "p99.9 ms", "max ms"))
+
+		for translator, histogram in self.latencies.items():
+			print("{:<12} {:>8} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}".format(
+				translator.name, histogram.total,
+				*(value / 1000 for value in (histogram.percentile(50), histogram.percentile(90), histogram.percentile(99), histogram.percentile(99.9), histogram.max))))
+
+			if histogram.percentile(99) / 1000 > args.slo_p99:
+				failures.append("{} p99 latency {:.1f}ms exceeds SLO of {}ms".format(translator.name, histogram.percentile(99) / 1000, args.slo_p99))
+
+		print()
+		print("outcomes:", dict(self.outcomes))
+		print("injected:", dict(self.stub.injected))
+		print("max in flight:", self.max_in_flight)
+		print("event loop lag: p99={:.1f}ms max={:.1f}ms".format(self.loop_lag.percentile(99) / 1000, self.loop_lag.max / 1000))
+
+		total = sum(self.outcomes.values())
+		exceptions = sum(count for outcome, count in self.outcomes.items() if outcome.startswith('exception'))
+		failed = total - self.outcomes[itemsetcopier.ReturnCode.CODE_OK.name]
+
+		if total and exceptions / total > args.max_exception_rate:
+			failures.append("{:.2%} of the requests raised an exception (max {:.2%})".format(exceptions / total, args.max_exception_rate))
+
+		if total and failed / total > args.max_failure_rate:
+			failures.append("{:.2%} of the requests failed (max {:.2%})".format(failed / total, args.max_failure_rate))
+
+		if self.loop_lag.percentile(99) / 1000 > args.max_loop_lag:
+			failures.append("Event loop lag p99 {:.1f}ms exceeds {}ms".format(self.loop_lag.percentile(99) / 1000, args.max_loop_lag))
+
+		# Memory growth is measured from the first sample so that warm-up allocations are not counted
+		rss_reference = self.samples[0][1] if self.samples else self.baseline[0]
+		rss_growth = (self.final[0] - rss_reference) / 2**20
+		print("memory growth: {:.1f}MB".format(rss_growth))
+
+		if rss_growth > args.max_memory_growth:
+			failures.append("Memory grew by {:.1f}MB (max {}MB)".format(rss_growth, args.max_memory_growth))
+
+		if self.baseline[1] >= 0:
+			fd_growth = self.final[1] - self.baseline[1]
+			print("file descriptor growth:", fd_growth)
+
+			if fd_growth > args.max_fd_growth:
+				failures.append("{} file descriptors/connections leaked (max {})".format(fd_growth, args.max_fd_growth))
+
+		print()
+
+		for failure in failures:
+			print("FAIL:", failure)
+
+		if not failures:
+			print("PASS")
+
+		return 1 if failures else 0
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Soak test translators against a local stub of the remote servers")
+	parser.add_argument('--rate', type=float, default=20, help="requests per second (default: %(default)s)")
+	parser.add_argument('--duration', type=float, default=300, help="in seconds (default: %(default)s)")
+	parser.add_argument('--seed', type=int, default=None, help="random seed for fault injection")
+	parser.add_argument('--slow-rate', type=float, default=0.02, help="probability of a slow stub response (default: %(default)s)")
+	parser.add_argument('--slow-delay', type=float, default=0.5, help="delay of a slow stub response, in seconds (default: %(default)s)")
+	parser.add_argument('--error-rate', type=float, default=0.01, help="probability of a 5xx stub response (default: %(default)s)")
+	parser.add_argument('--rollover-interval', type=float, default=60, help="mean delay between Data Dragon version rollovers, in seconds (default: %(default)s)")
+	parser.add_argument('--refresh-delay', type=float, default=30, help="overrides DATA_REFRESH_DELAY, in seconds (default: %(default)s)")
+	parser.add_argument('--sample-interval', type=float, default=10, help="in seconds (default: %(default)s)")
+	parser.add_argument('--slo-p99', type=float, default=1000, help="maximum p99 latency per translator, in ms (default: %(default)s)")
+	parser.add_argument('--max-exception-rate', type=float, default=0, help="maximum ratio of requests raising an exception (default: %(default)s)")
+	parser.add_argument('--max-failure-rate', type=float, default=0.1, help="maximum ratio of requests not returning CODE_OK (default: %(default)s)")
+	parser.add_argument('--max-loop-lag', type=float, default=100, help="maximum p99 event loop lag, in ms (default: %(default)s)")
+	parser.add_argument('--max-memory-growth', type=float, default=50, help="in MB (default: %(default)s)")
+	parser.add_argument('--max-fd-growth', type=int, default=5, help="maximum number of leaked file descriptors (default: %(default)s)")
+	args = parser.parse_args()
+
+	if args.rate <= 0 or args.duration <= 0:
+		parser.error("--rate and --duration must be positive")
+
+	soak = SoakTest(args)
+	asyncio.run(soak.run())
+	sys.exit(soak.report())
+
+
+if __name__ == '__main__':
+	main()